@@ -2,10 +2,11 @@ import argparse
 import logging
 import os
 import sys
+import tempfile
 import time
 
 from importlib import metadata
-from xmlrpc.client import ServerProxy
+from xmlrpc.client import Binary, ServerProxy
 
 __version__ = metadata.version("unoserver")
 logger = logging.getLogger("unoserver")
@@ -28,9 +29,20 @@ DOC_TYPES = {
 class UnoClient:
     """An RPC client for Unoserver"""
 
-    def __init__(self, server="127.0.0.1", port="2003", host_location="auto"):
+    def __init__(
+        self,
+        server="127.0.0.1",
+        port="2003",
+        host_location="auto",
+        rpc="xmlrpc",
+        shared_tmpdir=None,
+    ):
         self.server = server
         self.port = port
+        self.shared_tmpdir = shared_tmpdir
+        if rpc not in ("xmlrpc", "msgpack"):
+            raise RuntimeError("rpc can be 'xmlrpc' or 'msgpack'")
+        self.rpc = rpc
         if host_location == "auto":
             if server in ("127.0.0.1", "localhost"):
                 self.remote = False
@@ -43,6 +55,35 @@ class UnoClient:
         else:
             raise RuntimeError("host_location can be 'auto', 'remote', or 'local'")
 
+    def _proxy(self):
+        if self.rpc == "msgpack":
+            from unoserver import msgpackrpc
+
+            # The MessagePack-RPC server runs on the port after the XML-RPC port
+            return msgpackrpc.ServerProxy(self.server, int(self.port) + 1)
+
+        return ServerProxy(f"http://{self.server}:{self.port}", allow_none=True)
+
+    def _use_shared_tmpdir(self, outpath, *data):
+        """Should file data be passed through the shared temporary directory
+
+        If the server runs locally and can access shared_tmpdir, for example
+        /dev/shm, we can pass file data to and from the server as paths to
+        temporary files, instead of sending it over the RPC connection. The
+        files are in a directory only our user can access, so the server has
+        to run as the same user.
+        """
+        if self.remote or self.shared_tmpdir is None:
+            return False
+        return outpath is None or any(d is not None for d in data)
+
+    @staticmethod
+    def _write_tmpfile(tmpdir, name, data):
+        path = os.path.join(tmpdir, name)
+        with open(path, "wb") as tmpfile:
+            tmpfile.write(data)
+        return path
+
     def _connect(self, proxy, retries=5, sleep=10):
         """Check the connection to the proxy multiple times
 
@@ -106,6 +147,27 @@ class UnoClient:
             else:
                 convert_to = os.path.splitext(outpath)[-1].strip(os.path.extsep)
 
+        if self._use_shared_tmpdir(outpath, indata):
+            with tempfile.TemporaryDirectory(dir=self.shared_tmpdir) as tmpdir:
+                if indata is not None:
+                    inpath = self._write_tmpfile(tmpdir, "input", indata)
+                tmp_outpath = outpath
+                if outpath is None:
+                    tmp_outpath = os.path.join(tmpdir, f"output.{convert_to}")
+                self.convert(
+                    inpath=inpath,
+                    outpath=tmp_outpath,
+                    convert_to=convert_to,
+                    filtername=filtername,
+                    filter_options=filter_options,
+                    update_index=update_index,
+                    infiltername=infiltername,
+                )
+                if outpath is None:
+                    with open(tmp_outpath, "rb") as outfile:
+                        return outfile.read()
+                return
+
         if inpath:
             if self.remote:
                 with open(inpath, "rb") as infile:
@@ -119,7 +181,7 @@ class UnoClient:
             if os.path.isdir(outpath):
                 raise ValueError("The outpath can not be a directory")
 
-        with ServerProxy(f"http://{self.server}:{self.port}", allow_none=True) as proxy:
+        with self._proxy() as proxy:
             logger.info("Connecting.")
             logger.debug(f"Host: {self.server} Port: {self.port}")
             info = self._connect(proxy)
@@ -150,15 +212,17 @@ class UnoClient:
                 infiltername,
             )
             if result is not None:
-                # We got the file back over xmlrpc:
+                # We got the file back over the RPC connection:
+                if isinstance(result, Binary):
+                    result = result.data
                 if outpath:
                     logger.info(f"Writing to {outpath}.")
                     with open(outpath, "wb") as outfile:
-                        outfile.write(result.data)
+                        outfile.write(result)
                 else:
                     # Return the result as a blob
-                    logger.info(f"Returning {len(result.data)} bytes.")
-                    return result.data
+                    logger.info(f"Returning {len(result)} bytes.")
+                    return result
             else:
                 logger.info(f"Saved to {outpath}.")
 
@@ -206,6 +270,26 @@ class UnoClient:
         elif filetype is None:
             filetype = os.path.splitext(outpath)[-1].strip(os.path.extsep)
 
+        if self._use_shared_tmpdir(outpath, olddata, newdata):
+            with tempfile.TemporaryDirectory(dir=self.shared_tmpdir) as tmpdir:
+                if olddata is not None:
+                    oldpath = self._write_tmpfile(tmpdir, "old", olddata)
+                if newdata is not None:
+                    newpath = self._write_tmpfile(tmpdir, "new", newdata)
+                tmp_outpath = outpath
+                if outpath is None:
+                    tmp_outpath = os.path.join(tmpdir, f"output.{filetype}")
+                self.compare(
+                    oldpath=oldpath,
+                    newpath=newpath,
+                    outpath=tmp_outpath,
+                    filetype=filetype,
+                )
+                if outpath is None:
+                    with open(tmp_outpath, "rb") as outfile:
+                        return outfile.read()
+                return
+
         if self.remote:
             if oldpath:
                 with open(oldpath, "rb") as infile:
@@ -222,7 +306,7 @@ class UnoClient:
         if newpath:
             newpath = os.path.abspath(newpath)
 
-        with ServerProxy(f"http://{self.server}:{self.port}", allow_none=True) as proxy:
+        with self._proxy() as proxy:
             logger.info("Connecting.")
             logger.debug(f"Host: {self.server} Port: {self.port}")
             self._connect(proxy)
@@ -237,15 +321,17 @@ class UnoClient:
                 filetype,
             )
             if result is not None:
-                # We got the file back over xmlrpc:
+                # We got the file back over the RPC connection:
+                if isinstance(result, Binary):
+                    result = result.data
                 if outpath:
                     logger.info(f"Writing to {outpath}.")
                     with open(outpath, "wb") as outfile:
-                        outfile.write(result.data)
+                        outfile.write(result)
                 else:
                     # Return the result as a blob
-                    logger.info(f"Returning {len(result.data)} bytes.")
-                    return result.data
+                    logger.info(f"Returning {len(result)} bytes.")
+                    return result
             else:
                 logger.info(f"Saved to {outpath}.")
 
@@ -315,6 +401,21 @@ def converter_main():
         "Default is auto, and it will send the file as a path if the host is 127.0.0.1 or "
         "localhost, and binary data for other hosts.",
     )
+    parser.add_argument(
+        "--rpc",
+        default="xmlrpc",
+        choices=["xmlrpc", "msgpack"],
+        help="The RPC protocol to use. msgpack is faster for large files, but requires "
+        "the msgpack library, and unoserver to be started with --msgpack-rpc.",
+    )
+    parser.add_argument(
+        "--shared-tmpdir",
+        default=None,
+        help="A directory that both the client and a local server can access, like "
+        "/dev/shm. If given, data from stdin and to stdout is passed to the server in "
+        "temporary files there, instead of over the RPC connection. The server must "
+        "run as the same user, as the files are only accessible to that user.",
+    )
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -338,7 +439,9 @@ def converter_main():
     if args.verbose and args.quiet:
         logger.debug("Make up your mind, yo!")
 
-    client = UnoClient(args.host, args.port, args.host_location)
+    client = UnoClient(
+        args.host, args.port, args.host_location, args.rpc, args.shared_tmpdir
+    )
 
     if args.outfile == "-":
         # Set outfile to None, to get the data returned from the function,
@@ -409,6 +512,21 @@ def comparer_main():
         "Default is auto, and it will send the file as a path if the host is 127.0.0.1 or "
         "localhost, and binary data for other hosts.",
     )
+    parser.add_argument(
+        "--rpc",
+        default="xmlrpc",
+        choices=["xmlrpc", "msgpack"],
+        help="The RPC protocol to use. msgpack is faster for large files, but requires "
+        "the msgpack library, and unoserver to be started with --msgpack-rpc.",
+    )
+    parser.add_argument(
+        "--shared-tmpdir",
+        default=None,
+        help="A directory that both the client and a local server can access, like "
+        "/dev/shm. If given, data from stdin and to stdout is passed to the server in "
+        "temporary files there, instead of over the RPC connection. The server must "
+        "run as the same user, as the files are only accessible to that user.",
+    )
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -432,7 +550,9 @@ def comparer_main():
     if args.verbose and args.quiet:
         logger.debug("Make up your mind, yo!")
 
-    client = UnoClient(args.host, args.port, args.host_location)
+    client = UnoClient(
+        args.host, args.port, args.host_location, args.rpc, args.shared_tmpdir
+    )
 
     if args.outfile == "-":
         # Set outfile to None, to get the data returned from the function,
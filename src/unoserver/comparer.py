@@ -10,10 +10,13 @@ except ImportError:
 import io
 import logging
 import os
+import threading
 import unohelper
 
 from com.sun.star.beans import PropertyValue
 from com.sun.star.io import XOutputStream
+from com.sun.star.lang import DisposedException
+from com.sun.star.util import CloseVetoException
 
 logger = logging.getLogger("unoserver")
 
@@ -77,6 +80,9 @@ class UnoComparer:
         self.type_service = self.service.createInstanceWithContext(
             "com.sun.star.document.TypeDetection", self.context
         )
+        self._document = None
+        self._token = None
+        self._lock = threading.Lock()
 
     def is_comparable(self, import_type, importOrg_type):
         # List export filters. You can only search on module, iflags and eflags,
@@ -122,6 +128,25 @@ class UnoComparer:
         # No filter found
         return None
 
+    def cancel_current(self, token=None):
+        """Closes the document that is currently being compared, if any
+
+        This aborts a comparison without having to restart LibreOffice. If a
+        token is given, it is only cancelled if it was started with that token.
+        """
+        with self._lock:
+            if token is not None and token != self._token:
+                # That one is already finished
+                return
+            document = self._document
+            self._document = self._token = None
+        if document is not None:
+            logger.info("Closing the document being compared")
+            try:
+                document.close(True)
+            except (CloseVetoException, DisposedException) as e:
+                logger.warning("Could not close the document: %s", e)
+
     def compare(
         self,
         oldpath=None,
@@ -130,6 +155,7 @@ class UnoComparer:
         newdata=None,
         outpath=None,
         filetype=None,
+        token=None,
     ):
         """Compare two files and convert the result from one type to another.
 
@@ -142,6 +168,9 @@ class UnoComparer:
                  the content of the converted file will be returned as a byte string.
 
         filetype: The extension of the desired file type, ie "pdf", "xlsx", etc.
+
+        token: Any object identifying this comparison, which can be passed to
+               cancel_current() to make sure only this comparison is cancelled.
         """
         new_props = (PropertyValue(Name="Hidden", Value=True),)
 
@@ -166,6 +195,9 @@ class UnoComparer:
         new_document = self.desktop.loadComponentFromURL(
             newpath, "_blank", 0, new_props
         )
+        with self._lock:
+            self._document = new_document
+            self._token = token
         new_type = get_doc_type(new_document)
 
         old_props = (PropertyValue(Name="Hidden", Value=True),)
@@ -262,7 +294,12 @@ class UnoComparer:
             new_document.dispose()
 
         finally:
-            new_document.close(True)
+            # The document is already closed if the comparison was cancelled
+            with self._lock:
+                cancelled = self._document is None
+                self._document = self._token = None
+            if not cancelled:
+                new_document.close(True)
 
         if outpath is None:
             return output_stream.buffer.getvalue()
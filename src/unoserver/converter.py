@@ -10,11 +10,14 @@ except ImportError:
 import io
 import logging
 import os
+import threading
 import unohelper
 
 from pathlib import Path
 from com.sun.star.beans import PropertyValue
 from com.sun.star.io import XOutputStream
+from com.sun.star.lang import DisposedException
+from com.sun.star.util import CloseVetoException
 
 logger = logging.getLogger("unoserver")
 
@@ -87,6 +90,9 @@ class UnoConverter:
         )
         self._export_filters = None
         self._import_filters = None
+        self._document = None
+        self._token = None
+        self._lock = threading.Lock()
 
     def find_filter(self, import_type, export_type):
         for export_filter in self.get_available_export_filters():
@@ -153,6 +159,25 @@ class UnoConverter:
                 names[name] = flt["Name"]
         return names
 
+    def cancel_current(self, token=None):
+        """Closes the document that is currently being converted, if any
+
+        This aborts a conversion without having to restart LibreOffice. If a
+        token is given, it is only cancelled if it was started with that token.
+        """
+        with self._lock:
+            if token is not None and token != self._token:
+                # That one is already finished
+                return
+            document = self._document
+            self._document = self._token = None
+        if document is not None:
+            logger.info("Closing the document being converted")
+            try:
+                document.close(True)
+            except (CloseVetoException, DisposedException) as e:
+                logger.warning("Could not close the document: %s", e)
+
     def convert(
         self,
         inpath=None,
@@ -163,6 +188,7 @@ class UnoConverter:
         filter_options=[],
         update_index=True,
         infiltername=None,
+        token=None,
     ):
         """Converts a file from one type to another
 
@@ -183,6 +209,9 @@ class UnoConverter:
 
         infiltername: The name of the input filter, ie "writer8", "PowerPoint 3", etc.
 
+        token: Any object identifying this conversion, which can be passed to
+               cancel_current() to make sure only this conversion is cancelled.
+
         You must specify the inpath or the indata, and you must specify and outpath or a convert_to.
         """
         input_props = (PropertyValue(Name="ReadOnly", Value=True),)
@@ -233,6 +262,10 @@ class UnoConverter:
             logger.error(error)
             raise RuntimeError(error)
 
+        with self._lock:
+            self._document = document
+            self._token = token
+
         if update_index:
             # Update document indexes
             for ii in range(2):
@@ -348,7 +381,12 @@ class UnoConverter:
             document.storeToURL(export_path, output_props)
 
         finally:
-            document.close(True)
+            # The document is already closed if the conversion was cancelled
+            with self._lock:
+                cancelled = self._document is None
+                self._document = self._token = None
+            if not cancelled:
+                document.close(True)
 
         if outpath is None:
             return output_stream.buffer.getvalue()
@@ -6,32 +6,49 @@ import os
 import shutil
 import signal
 import socket
+import socketserver
 import subprocess
 import sys
 import tempfile
 import threading
 import time
 import platform
+import random
+import select
+import xmlrpc.client
 import xmlrpc.server
 from importlib import metadata
 from pathlib import Path
 
 from concurrent import futures
 
-from unoserver import converter, comparer
-from com.sun.star.uno import Exception as UnoException
-
 API_VERSION = "3"
 __version__ = metadata.version("unoserver")
 logger = logging.getLogger("unoserver")
 
 
-class XMLRPCServer(xmlrpc.server.SimpleXMLRPCServer):
+class _SignalReceived(Exception):
+    """Raised to stop serve_forever() when a signal arrives"""
+
+
+class XMLRPCRequestHandler(xmlrpc.server.SimpleXMLRPCRequestHandler):
+    # Let clients reuse the connection for several calls
+    protocol_version = "HTTP/1.1"
+
+
+class XMLRPCServer(socketserver.ThreadingMixIn, xmlrpc.server.SimpleXMLRPCServer):
+    # Each request gets a thread, so that small calls like info() don't have to
+    # wait for a conversion. The UNO calls themselves are still serialized.
+    daemon_threads = True
+    allow_reuse_address = True
+
     def __init__(
         self,
         addr: tuple[str, int],
         allow_none: bool = False,
+        wakeup: socket.socket | None = None,
     ) -> None:
+        self.wakeup = wakeup
         addr_info = socket.getaddrinfo(addr[0], addr[1], proto=socket.IPPROTO_TCP)
 
         if len(addr_info) == 0:
@@ -41,44 +58,161 @@ class XMLRPCServer(xmlrpc.server.SimpleXMLRPCServer):
 
         self.address_family = addr_info[0][0]
         self.socket_type = addr_info[0][1]
-        super().__init__(addr=addr_info[0][4], allow_none=allow_none)
+        super().__init__(
+            addr=addr_info[0][4],
+            requestHandler=XMLRPCRequestHandler,
+            allow_none=allow_none,
+        )
+
+    def get_request(self):
+        conn, addr = super().get_request()
+        # Responses are written in one go, don't delay them
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conn, addr
+
+    def service_actions(self):
+        super().service_actions()
+        if self.wakeup is None:
+            return
+
+        # Signals write their number to the wakeup socket, see UnoServer.start()
+        try:
+            signals = self.wakeup.recv(64)
+        except BlockingIOError:
+            return
+        if signals:
+            raise _SignalReceived()
+
+
+class _ProcessWatcher:
+    """Waits for a process to exit without sleeping a fixed time
+
+    On Linux this uses a pidfd and on BSD/macOS a kqueue, so wait() returns
+    as soon as the process exits. Elsewhere it falls back to polling.
+    """
+
+    def __init__(self, process):
+        self.process = process
+        self._pidfd = None
+        self._poll = None
+        self._kqueue = None
+
+        if process.poll() is not None:
+            # Already dead, nothing to watch
+            return
+
+        try:
+            if hasattr(os, "pidfd_open"):
+                # Linux >= 5.3, Python >= 3.9
+                self._pidfd = os.pidfd_open(process.pid)
+                # Not select(), as that fails for fds >= 1024, which happens
+                # when unoserver is embedded in a process with many open files.
+                self._poll = select.poll()
+                self._poll.register(self._pidfd, select.POLLIN)
+            elif hasattr(select, "kqueue"):
+                self._kqueue = select.kqueue()
+                self._kqueue.control(
+                    [
+                        select.kevent(
+                            process.pid,
+                            filter=select.KQ_FILTER_PROC,
+                            flags=select.KQ_EV_ADD | select.KQ_EV_ONESHOT,
+                            fflags=select.KQ_NOTE_EXIT,
+                        )
+                    ],
+                    0,
+                )
+        except OSError:
+            # Not supported by the kernel, or the process just exited.
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def wait(self, timeout=None):
+        """Wait at most timeout seconds, returns True if the process exited"""
+        if self.process.poll() is not None:
+            return True
+
+        if self._poll is not None:
+            # poll() takes milliseconds, and blocks on None
+            self._poll.poll(None if timeout is None else timeout * 1000)
+        elif self._kqueue is not None:
+            self._kqueue.control(None, 1, timeout)
+        else:
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                pass
+
+        return self.process.poll() is not None
+
+    def close(self):
+        if self._pidfd is not None:
+            self._poll = None
+            os.close(self._pidfd)
+            self._pidfd = None
+        if self._kqueue is not None:
+            self._kqueue.close()
+            self._kqueue = None
 
 
 class UnoServer:
+    # How long to wait for a timed out conversion to stop after cancelling it,
+    # before giving up and terminating LibreOffice.
+    cancel_timeout = 5
+
     def __init__(
         self,
         interface="127.0.0.1",
-        port="2003",
+        port=2003,
         uno_interface="127.0.0.1",
-        uno_port="2002",
+        uno_port=2002,
         user_installation=None,
         conversion_timeout=None,
         stop_after=None,
+        terminate_on_timeout=False,
+        msgpack_rpc=False,
     ):
         self.interface = interface
         self.uno_interface = uno_interface
-        self.port = port
-        self.uno_port = uno_port
+        self.port = int(port)
+        self.uno_port = int(uno_port)
         self.user_installation = user_installation
         self.conversion_timeout = conversion_timeout
         self.stop_after = stop_after
+        self.terminate_on_timeout = terminate_on_timeout
+        self.msgpack_rpc = msgpack_rpc
         self.libreoffice_process = None
         self.xmlrcp_thread = None
         self.xmlrcp_server = None
         self.intentional_exit = False
-
-    def start(self, executable="libreoffice"):
-        logger.info(f"Starting unoserver {__version__}.")
+        self._info_cache = None
+        self._ready = threading.Event()
+        self._ready_error = None
+        # Set when start() gives up, so that serve() doesn't start serving
+        self._abort_startup = threading.Event()
+        self._startup_lock = threading.Lock()
+        self._wakeup_r = None
+        self._wakeup_w = None
+        self._old_wakeup_fd = -1
+        # Created by start(), as stop() shuts them down
+        self._conv_executor = None
+        self._comp_executor = None
 
         connection = (
-            "socket,host=%s,port=%s,tcpNoDelay=1;urp;StarOffice.ComponentContext"
-            % (self.uno_interface, self.uno_port)
+            f"socket,host={self.uno_interface},port={self.uno_port},tcpNoDelay=1;"
+            "urp;StarOffice.ComponentContext"
         )
 
         # I think only --headless and --norestore are needed for
         # command line usage, but let's add everything to be safe.
-        cmd = [
-            executable,
+        # The executable is filled in by start().
+        self._lo_cmd = [
+            "libreoffice",
             "--headless",
             "--invisible",
             "--nocrashreport",
@@ -90,6 +224,29 @@ class UnoServer:
             f"--accept={connection}",
         ]
 
+    def start(self, executable="libreoffice"):
+        logger.info(f"Starting unoserver {__version__}.")
+        # stop() only joins the thread once it has been started
+        self.xmlrcp_thread = None
+        self.xmlrcp_server = None
+        self.intentional_exit = False
+        self._ready.clear()
+        self._ready_error = None
+        self._abort_startup.clear()
+
+        # UNO calls can't usefully run in parallel, so conversions and
+        # comparisons each get one long-lived worker thread. The executors
+        # are only there to implement the conversion timeout.
+        self._conv_executor = futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="uno-convert"
+        )
+        self._comp_executor = futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="uno-compare"
+        )
+
+        self._lo_cmd[0] = executable
+        cmd = self._lo_cmd
+
         logger.info("Command: " + " ".join(cmd))
         # Start LibreOffice process
         if platform.system() == "Windows":
@@ -97,45 +254,175 @@ class UnoServer:
                 cmd, creationflags=subprocess.CREATE_NEW_PROCESS_GROUP
             )
         else:
+            # Don't add preexec_fn, user/group changes or similar here. Without
+            # them, Python >= 3.10 starts the process with vfork() instead of
+            # copying the whole parent process with fork().
             self.libreoffice_process = subprocess.Popen(cmd, start_new_session=True)
-        self.xmlrcp_thread = threading.Thread(None, self.serve)
+
+        # Python also writes the number of any signal we handle to this
+        # socket, which makes the XMLRPC server stop serving. serve() then
+        # terminates LibreOffice.
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._old_wakeup_fd = signal.set_wakeup_fd(
+            self._wakeup_w.fileno(), warn_on_full_buffer=False
+        )
 
         def signal_handler(signum, frame):
             self.intentional_exit = True
-            logger.info("Sending signal to LibreOffice")
-            try:
-                self.libreoffice_process.send_signal(signum)
-            except ProcessLookupError as e:
-                # 3 means the process is already dead
-                if e.errno != 3:
-                    raise
-
-            if self.xmlrcp_server is not None:
-                self.stop()  # Ensure the server stops
+            if self.xmlrcp_server is None:
+                # We are still starting up, so nothing reads the wakeup socket
+                self._abort_startup.set()
+                self._safe_terminate_process()
 
         signal.signal(signal.SIGTERM, signal_handler)
         signal.signal(signal.SIGINT, signal_handler)
 
-        # Signal SIGHUP is available only in Unix systems
+        # Signal SIGHUP is available only in Unix systems. Ignore it, so that
+        # closing the terminal doesn't stop the server.
         if platform.system() != "Windows":
-            signal.signal(signal.SIGHUP, signal_handler)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
 
-        time.sleep(5)
+        if not self._wait_for_libreoffice():
+            if not self.intentional_exit:
+                logger.critical("LibreOffice exited during startup.")
+            self.stop()
+            return None
 
+        self.xmlrcp_thread = threading.Thread(None, self.serve)
         self.xmlrcp_thread.start()
 
-        # Give the thread time to start
-        time.sleep(2)
-        # Check if it succeeded
-        if not self.xmlrcp_thread.is_alive():
+        # Wait for serve() to connect to LibreOffice and start the servers
+        if not self._ready.wait(timeout=60) or self._ready_error is not None:
             logger.info("Failed to start servers")
+            # If serve() is still connecting, make it give up instead of
+            # starting to serve after we stopped waiting for it.
+            with self._startup_lock:
+                self._abort_startup.set()
+            self._safe_terminate_process()
             self.stop()
             return None
 
         return self.libreoffice_process
 
+    def _wait_for_libreoffice(self, timeout=60):
+        """Wait until LibreOffice accepts connections on the UNO port
+
+        Returns False if LibreOffice exits before that. If it's not listening
+        after the timeout, we carry on anyway and let serve() keep retrying.
+        """
+        deadline = time.monotonic() + timeout
+        with _ProcessWatcher(self.libreoffice_process) as watcher:
+            while time.monotonic() < deadline:
+                try:
+                    with socket.create_connection(
+                        (self.uno_interface, self.uno_port), timeout=0.1
+                    ):
+                        return True
+                except OSError:
+                    # Not listening yet
+                    pass
+
+                if watcher.wait(timeout=0.1):
+                    return False
+
+        logger.warning("LibreOffice is slow to start, still waiting.")
+        return True
+
+    def _connect_with_retry(
+        self, cls, name, max_attempts=20, base=0.1, cap=2.0, jitter=0.5
+    ):
+        """Connect cls to LibreOffice, retrying until it accepts the connection
+
+        While the connection is refused, LibreOffice hasn't started yet, so we
+        retry with an exponential backoff plus jitter. Any other error is not
+        retried. If the connection can't be made, LibreOffice is terminated
+        and a RuntimeError is raised.
+        """
+        from com.sun.star.uno import Exception as UnoException
+
+        logger.info(f"Starting {name}.")
+        for attempt in range(max_attempts):
+            if self._abort_startup.is_set():
+                break
+            try:
+                return cls(interface=self.uno_interface, port=self.uno_port)
+            except UnoException as e:
+                # Any other error than a refused connection is a real failure
+                if "Connection refused" not in str(e):
+                    logger.error("Error when starting %s: %s", name, e)
+                    break
+
+                delay = min(cap, base * 2**attempt)
+                delay *= 1 + random.uniform(-jitter, jitter)
+                logger.debug("Libreoffice is not yet started, retrying in %.2fs", delay)
+                self._abort_startup.wait(delay)
+
+        # Make sure it's really dead
+        self._safe_terminate_process()
+        raise RuntimeError(f"Could not start Libreoffice for {name}")
+
+    def _run_with_timeout(self, executor, name, function, cancel, *args):
+        """Run function in the executor's worker thread
+
+        The calling RPC thread waits at most conversion_timeout seconds for
+        the result, and raises futures.TimeoutError if it doesn't come.
+        """
+        # The token makes sure that cancelling doesn't close the document
+        # of a later request, if this one finishes in the meantime.
+        token = object()
+        future = executor.submit(function, *args, token=token)
+        done, _ = futures.wait([future], timeout=self.conversion_timeout)
+        if done:
+            return future.result()
+
+        if future.cancel():
+            # It was still waiting for an earlier request, so there is
+            # no document of ours to close.
+            logger.error(f"{name} timeout, it never started.")
+        elif future.done():
+            # It finished after all
+            return future.result()
+        elif self.terminate_on_timeout:
+            logger.error(f"{name} timeout, terminating conversion and exiting.")
+            self._terminate_after_timeout()
+        else:
+            logger.error(f"{name} timeout, cancelling it.")
+            cancel(token)
+            # If it hangs while loading the document, there is nothing to
+            # close, and the worker thread would stay blocked forever.
+            done, _ = futures.wait([future], timeout=self.cancel_timeout)
+            if not done:
+                logger.error(
+                    f"{name} could not be cancelled, terminating LibreOffice and exiting."
+                )
+                self._terminate_after_timeout()
+        raise futures.TimeoutError()
+
+    def _terminate_after_timeout(self):
+        self.conv.local_context.dispose()
+        self._safe_terminate_process()
+
+    def _get_info(self):
+        if self._info_cache is None:
+            self._info_cache = {
+                "unoserver": __version__,
+                "api": API_VERSION,
+                "import_filters": self.conv.get_filter_names(
+                    self.conv.get_available_import_filters()
+                ),
+                "export_filters": self.conv.get_filter_names(
+                    self.conv.get_available_export_filters()
+                ),
+            }
+        return self._info_cache
+
     def _safe_terminate_process(self):
         """安全终止 LibreOffice 进程"""
+        # The filters belong to this LibreOffice instance
+        self._info_cache = None
+
         if self.libreoffice_process is None:
             return
 
@@ -167,74 +454,52 @@ class UnoServer:
             self.libreoffice_process = None
 
     def serve(self):
+        try:
+            self._serve()
+        except Exception as e:
+            self._ready_error = e
+            raise
+        finally:
+            # Don't leave start() waiting if we never got ready
+            self._ready.set()
+
+    def _serve(self):
+        # The UNO libraries are slow to import, so they are only imported
+        # here, and not for --help, --version etc.
+        from unoserver import converter, comparer
+
         # Create server
-        with XMLRPCServer((self.interface, int(self.port)), allow_none=True) as server:
-            logger.info("Starting UnoConverter.")
-            attempts = 20
-            while attempts > 0:
-                try:
-                    self.conv = converter.UnoConverter(
-                        interface=self.uno_interface, port=self.uno_port
-                    )
-                    break
-                except UnoException as e:
-                    # A connection refused just means it hasn't started yet:
-                    if "Connection refused" in str(e):
-                        logger.debug("Libreoffice is not yet started")
-                        time.sleep(2)
-                        attempts -= 1
-                        continue
-                    # This is a different error
-                    logger.warning("Error when starting UnoConverter, retrying: %s", e)
-                    # These kinds of errors can be retried fewer times
-                    attempts -= 4
-                    time.sleep(5)
-                    continue
-            else:
-                # We ran out of attempts
-                logger.critical("Could not start Libreoffice, exiting.")
-                # Make sure it's really dead
-                self._safe_terminate_process()
+        with XMLRPCServer(
+            (self.interface, self.port), allow_none=True, wakeup=self._wakeup_r
+        ) as server:
+            try:
+                self.conv = self._connect_with_retry(
+                    converter.UnoConverter, "UnoConverter"
+                )
+                self.comp = self._connect_with_retry(
+                    comparer.UnoComparer, "UnoComparer"
+                )
+            except RuntimeError as e:
+                logger.critical("%s, exiting.", e)
+                self._ready_error = e
                 return
 
-            logger.info("Starting UnoComparer.")
-            attempts = 20
-            while attempts > 0:
-                try:
-                    self.comp = comparer.UnoComparer(
-                        interface=self.uno_interface, port=self.uno_port
-                    )
-                    break
-                except UnoException as e:
-                    # A connection refused just means it hasn't started yet:
-                    if "Connection refused" in str(e):
-                        logger.debug("Libreoffice is not yet started")
-                        attempts -= 1
-                        time.sleep(2)
-                        continue
-                    # This is a different error
-                    logger.warning("Error when starting UnoConverter, retrying: %s", e)
-                    # These kinds of errors can be retried fewer times
-                    attempts -= 4
-                    time.sleep(5)
-                    continue
-            else:
-                # We ran out of attempts
-                logger.critical("Could not start Libreoffice, exiting.")
-                # Make sure it's really dead
-                self._safe_terminate_process()
-                return
+            # The filter lists don't change while LibreOffice runs, so
+            # build the info() data once up front.
+            self._get_info()
 
-            self.xmlrcp_server = server
             server.register_introspection_functions()
 
             self.number_of_requests = 0
+            requests_lock = threading.Lock()
 
             def stop_after():
                 if self.stop_after is None:
                     return
-                self.number_of_requests += 1
-                if self.number_of_requests == self.stop_after:
+                with requests_lock:
+                    self.number_of_requests += 1
+                    number_of_requests = self.number_of_requests
+                if number_of_requests == self.stop_after:
                     logger.info(
                         "Processed %d requests, exiting.",
                         self.stop_after,
@@ -244,18 +509,7 @@ class UnoServer:
 
             @server.register_function
             def info():
-                import_filters = self.conv.get_filter_names(
-                    self.conv.get_available_import_filters()
-                )
-                export_filters = self.conv.get_filter_names(
-                    self.conv.get_available_export_filters()
-                )
-                return {
-                    "unoserver": __version__,
-                    "api": API_VERSION,
-                    "import_filters": import_filters,
-                    "export_filters": export_filters,
-                }
+                return self._get_info()
 
             @server.register_function
             def convert(
@@ -268,33 +522,25 @@ class UnoServer:
                 update_index=True,
                 infiltername=None,
             ):
-                if indata is not None:
+                if isinstance(indata, xmlrpc.client.Binary):
                     indata = indata.data
 
-                with futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(
-                        self.conv.convert,
-                        inpath,
-                        indata,
-                        outpath,
-                        convert_to,
-                        filtername,
-                        filter_options,
-                        update_index,
-                        infiltername,
-                    )
-                    try:
-                        result = future.result(timeout=self.conversion_timeout)
-                    except futures.TimeoutError:
-                        logger.error(
-                            "Conversion timeout, terminating conversion and exiting."
-                        )
-                        self.conv.local_context.dispose()
-                        self._safe_terminate_process()
-                        raise
-                    else:
-                        stop_after()
-                        return result
+                result = self._run_with_timeout(
+                    self._conv_executor,
+                    "Conversion",
+                    self.conv.convert,
+                    self.conv.cancel_current,
+                    inpath,
+                    indata,
+                    outpath,
+                    convert_to,
+                    filtername,
+                    filter_options,
+                    update_index,
+                    infiltername,
+                )
+                stop_after()
+                return result
 
             @server.register_function
             def compare(
@@ -305,51 +551,68 @@ class UnoServer:
                 outpath=None,
                 filetype=None,
             ):
-                if olddata is not None:
+                if isinstance(olddata, xmlrpc.client.Binary):
                     olddata = olddata.data
-                if newdata is not None:
+                if isinstance(newdata, xmlrpc.client.Binary):
                     newdata = newdata.data
 
-                with futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(
-                        self.comp.compare,
-                        oldpath,
-                        olddata,
-                        newpath,
-                        newdata,
-                        outpath,
-                        filetype,
-                    )
+                result = self._run_with_timeout(
+                    self._comp_executor,
+                    "Comparison",
+                    self.comp.compare,
+                    self.comp.cancel_current,
+                    oldpath,
+                    olddata,
+                    newpath,
+                    newdata,
+                    outpath,
+                    filetype,
+                )
+                stop_after()
+                return result
+
+            msgpack_server = None
+            if self.msgpack_rpc:
+                from unoserver import msgpackrpc
+
+                # Same functions, but the document data is sent as raw bytes
+                msgpack_server = msgpackrpc.MsgpackRPCServer(
+                    (self.interface, self.port + 1)
+                )
+                for function in (info, convert, compare):
+                    msgpack_server.register_function(function)
+                threading.Thread(
+                    None, msgpack_server.serve_forever, daemon=True
+                ).start()
+
+            # Only publish the server once serve_forever() is about to run,
+            # as shutdown() waits for serve_forever() to finish.
+            with self._startup_lock:
+                if not self._abort_startup.is_set():
+                    self.xmlrcp_server = server
+
+            if self.xmlrcp_server is server:
+                logger.info("Started.")
+                self._ready.set()
                 try:
-                    result = future.result(timeout=self.conversion_timeout)
-                except futures.TimeoutError:
-                    logger.error(
-                        "Comparison timeout, terminating conversion and exiting."
-                    )
-                    self.conv.local_context.dispose()
-                    self._safe_terminate_process()
-                    raise
-                else:
-                    stop_after()
-                    return result
+                    server.serve_forever()
+                except _SignalReceived:
+                    logger.info("Stopping the XMLRPC server")
+
+            if msgpack_server is not None:
+                msgpack_server.shutdown()
+                msgpack_server.server_close()
 
-            logger.info("Started.")
-            server.serve_forever()
+            # No more requests, so take LibreOffice down as well. This is the
+            # only place LibreOffice gets terminated on a normal shutdown.
+            self._safe_terminate_process()
 
     def stop(self):
 
         if self.xmlrcp_server is not None:
+            # serve_forever() polls for the shutdown request, so this
+            # returns without needing to wake up accept().
             self.xmlrcp_server.shutdown()
-            # Make a dummy connection to unblock accept() - otherwise it will
-            # hang indefinitely in the accept() call.
-            # noinspection PyBroadException
-            try:
-                with socket.create_connection(
-                    (self.interface, int(self.port)), timeout=1
-                ):
-                    pass
-            except Exception:
-                pass  # Ignore any except
 
         if self.xmlrcp_thread is not None:
             self.xmlrcp_thread.join()
@@ -357,6 +620,22 @@ class UnoServer:
         if self.libreoffice_process and self.libreoffice_process.poll() is None:
             self._safe_terminate_process()
 
+        if self._wakeup_w is not None:
+            # The wakeup fd can only be changed from the main thread
+            if threading.current_thread() is threading.main_thread():
+                signal.set_wakeup_fd(self._old_wakeup_fd)
+                self._wakeup_r.close()
+                self._wakeup_w.close()
+                self._wakeup_r = self._wakeup_w = None
+
+        for executor in (self._conv_executor, self._comp_executor):
+            if executor is None:
+                continue
+            if sys.version_info >= (3, 9):
+                executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                executor.shutdown(wait=False)
+
 
 def main():
     logging.basicConfig()
@@ -381,10 +660,13 @@ def main():
         help="The interface used by the Libreoffice UNO server",
     )
     parser.add_argument(
-        "--port", default="2003", help="The port used by the XMLRPC server"
+        "--port", type=int, default=2003, help="The port used by the XMLRPC server"
     )
     parser.add_argument(
-        "--uno-port", default="2002", help="The port used by the Libreoffice UNO server"
+        "--uno-port",
+        type=int,
+        default=2002,
+        help="The port used by the Libreoffice UNO server",
     )
     parser.add_argument("--daemon", action="store_true", help="Deamonize the server")
     parser.add_argument(
@@ -404,11 +686,23 @@ def main():
         help="If set, unoserver will write the Libreoffice PID to this file. If started "
         "in daemon mode, the file will not be deleted when unoserver exits.",
     )
+    parser.add_argument(
+        "--msgpack-rpc",
+        action="store_true",
+        help="Also serve MessagePack-RPC on the port after --port. This sends documents "
+        "as raw bytes, which is faster for large documents. Requires msgpack.",
+    )
     parser.add_argument(
         "--conversion-timeout",
         type=int,
-        help="Terminate Libreoffice and exit if a conversion does not complete in the "
-        "given time (in seconds).",
+        help="Cancel a conversion that does not complete in the given time "
+        "(in seconds).",
+    )
+    parser.add_argument(
+        "--terminate-on-timeout",
+        action="store_true",
+        help="Terminate Libreoffice and exit when a conversion times out, instead of "
+        "only cancelling the conversion.",
     )
     parser.add_argument(
         "--stop-after",
@@ -453,6 +747,17 @@ def main():
         if args.uno_port == args.port:
             raise RuntimeError("--port and --uno-port must be different")
 
+        if args.msgpack_rpc:
+            if args.uno_port == args.port + 1:
+                raise RuntimeError(
+                    "--msgpack-rpc uses the port after --port, so --uno-port must be different"
+                )
+            try:
+                from unoserver import msgpackrpc  # noqa: F401
+            except ImportError as e:
+                logger.critical(f"--msgpack-rpc is not available: {e}")
+                return 2
+
         server = UnoServer(
             args.interface,
             args.port,
@@ -461,6 +766,8 @@ def main():
             user_installation,
             args.conversion_timeout,
             args.stop_after,
+            args.terminate_on_timeout,
+            args.msgpack_rpc,
         )
 
         if args.executable is not None:
@@ -480,6 +787,9 @@ def main():
         # Otherwise it returns 1 after the process exits.
         process = server.start(executable=executable)
         if process is None:
+            if server.intentional_exit:
+                # Stopped by a signal while starting up, that's not a failure
+                return 0
             return 2
         pid = process.pid
 
@@ -489,6 +799,10 @@ def main():
             with open(args.libreoffice_pid_file, "wt") as upf:
                 upf.write(f"{pid}")
 
+        # Park until LibreOffice exits, then reap it
+        with _ProcessWatcher(process) as watcher:
+            while not watcher.wait():
+                pass
         process.wait()
 
         if not server.intentional_exit:
@@ -500,19 +814,10 @@ def main():
             # Remove the PID file
             os.unlink(args.libreoffice_pid_file)
 
-        try:
-            # Make sure it's really dead
-            os.kill(pid, 0)
-
-            if server.intentional_exit:
-                return 0
-            else:
-                return 1
-        except OSError as e:
-            if e.errno == 3:
-                # All good, it was already dead.
-                return 0
-            raise
+        if server.intentional_exit:
+            return 0
+        else:
+            return 1
 
 
 if __name__ == "__main__":
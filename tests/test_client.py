@@ -0,0 +1,125 @@
+"""Unoclient unit tests"""
+
+import os
+import stat
+
+import pytest
+
+from unittest import mock
+from unoserver import client
+
+
+@pytest.fixture
+def proxy():
+    """A fake server, that "converts" a file by reversing its content"""
+    proxy = mock.MagicMock()
+    proxy.info.return_value = {
+        "api": client.API_VERSION,
+        "import_filters": {},
+        "export_filters": {},
+    }
+
+    def convert(inpath, indata, outpath, *args):
+        with open(inpath, "rb") as infile:
+            data = infile.read()[::-1]
+        with open(outpath, "wb") as outfile:
+            outfile.write(data)
+
+    def compare(oldpath, olddata, newpath, newdata, outpath, filetype):
+        with open(oldpath, "rb") as oldfile, open(newpath, "rb") as newfile:
+            data = oldfile.read() + newfile.read()
+        with open(outpath, "wb") as outfile:
+            outfile.write(data)
+
+    proxy.convert.side_effect = convert
+    proxy.compare.side_effect = compare
+    with mock.patch.object(client.UnoClient, "_proxy") as proxy_mock:
+        proxy_mock.return_value.__enter__.return_value = proxy
+        yield proxy
+
+
+def test_use_shared_tmpdir(tmp_path):
+    clnt = client.UnoClient(shared_tmpdir=str(tmp_path))
+    # Some data has to be sent or returned
+    assert clnt._use_shared_tmpdir(None, None)
+    assert clnt._use_shared_tmpdir("out.pdf", b"data")
+    assert clnt._use_shared_tmpdir("out.pdf", None, b"data")
+    assert not clnt._use_shared_tmpdir("out.pdf", None)
+    assert not clnt._use_shared_tmpdir("out.pdf", None, None)
+
+    # Not configured
+    clnt = client.UnoClient()
+    assert not clnt._use_shared_tmpdir(None, b"data")
+
+    # The server can't see our files
+    clnt = client.UnoClient(server="10.0.0.1", shared_tmpdir=str(tmp_path))
+    assert not clnt._use_shared_tmpdir(None, b"data")
+
+
+def test_convert_shared_tmpdir(tmp_path, proxy):
+    clnt = client.UnoClient(shared_tmpdir=str(tmp_path))
+    assert clnt.convert(indata=b"abc", convert_to="pdf") == b"cba"
+
+    # The data was passed as files in the shared directory, not over RPC
+    inpath, indata, outpath = proxy.convert.call_args[0][:3]
+    assert indata is None
+    assert os.path.dirname(inpath) == os.path.dirname(outpath)
+    assert os.path.dirname(os.path.dirname(inpath)) == str(tmp_path)
+    # and they are cleaned up afterwards
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.skipif(os.name != "posix", reason="Needs POSIX permissions")
+def test_convert_shared_tmpdir_private(tmp_path, proxy):
+    modes = []
+
+    def convert(inpath, *args):
+        modes.append(stat.S_IMODE(os.stat(os.path.dirname(inpath)).st_mode))
+
+    proxy.convert.side_effect = convert
+    clnt = client.UnoClient(shared_tmpdir=str(tmp_path))
+    clnt.convert(indata=b"abc", outpath=str(tmp_path / "out.pdf"))
+
+    # Other users can't get at the files, even if the shared directory
+    # is world-writable like /dev/shm
+    assert modes == [0o700]
+
+
+def test_convert_shared_tmpdir_outpath(tmp_path, proxy):
+    clnt = client.UnoClient(shared_tmpdir=str(tmp_path / "shared"))
+    (tmp_path / "shared").mkdir()
+    outpath = tmp_path / "out.pdf"
+    assert clnt.convert(indata=b"abc", outpath=str(outpath)) is None
+    assert outpath.read_bytes() == b"cba"
+
+    # The result was written directly to the outpath
+    assert proxy.convert.call_args[0][2] == str(outpath)
+    assert os.listdir(tmp_path / "shared") == []
+
+
+def test_convert_no_shared_tmpdir(tmp_path, proxy):
+    proxy.convert.side_effect = None
+    proxy.convert.return_value = b"cba"
+    clnt = client.UnoClient()
+    assert clnt.convert(indata=b"abc", convert_to="pdf") == b"cba"
+
+    # The data was sent over RPC
+    inpath, indata, outpath = proxy.convert.call_args[0][:3]
+    assert inpath is None
+    assert indata == b"abc"
+    assert outpath is None
+
+
+def test_compare_shared_tmpdir(tmp_path, proxy):
+    clnt = client.UnoClient(shared_tmpdir=str(tmp_path))
+    oldpath = tmp_path / "old.odt"
+    oldpath.write_bytes(b"old")
+    result = clnt.compare(oldpath=str(oldpath), newdata=b"new", filetype="pdf")
+    assert result == b"oldnew"
+
+    oldpath_arg, olddata, newpath, newdata = proxy.compare.call_args[0][:4]
+    assert oldpath_arg == str(oldpath)
+    assert olddata is None
+    assert newdata is None
+    assert os.path.dirname(os.path.dirname(newpath)) == str(tmp_path)
+    assert os.listdir(tmp_path) == ["old.odt"]
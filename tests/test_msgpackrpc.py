@@ -0,0 +1,40 @@
+"""MessagePack-RPC unit tests"""
+import threading
+
+import pytest
+
+msgpackrpc = pytest.importorskip("unoserver.msgpackrpc")
+
+
+@pytest.fixture
+def rpc_server():
+    server = msgpackrpc.MsgpackRPCServer(("127.0.0.1", 0))
+
+    @server.register_function
+    def reverse(data):
+        return data[::-1]
+
+    @server.register_function
+    def fail():
+        raise ValueError("Nope")
+
+    thread = threading.Thread(None, server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_roundtrip(rpc_server):
+    with msgpackrpc.ServerProxy(*rpc_server.server_address[:2]) as proxy:
+        # Bytes are sent as is, and the connection is reused between calls
+        assert proxy.reverse(b"\x00\x01\x02") == b"\x02\x01\x00"
+        assert proxy.reverse("abc") == "cba"
+
+
+def test_errors(rpc_server):
+    with msgpackrpc.ServerProxy(*rpc_server.server_address[:2]) as proxy:
+        with pytest.raises(RuntimeError, match="ValueError: Nope"):
+            proxy.fail()
+        with pytest.raises(RuntimeError, match="not supported"):
+            proxy.missing()
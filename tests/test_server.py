@@ -1,15 +1,61 @@
 """Unoserver unit tests"""
+
 import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import types
+
+import pytest
 
+from concurrent import futures
 from unittest import mock
 from unoserver import server
 
 TEST_DOCS = os.path.join(os.path.abspath(os.path.split(__file__)[0]), "documents")
 
+# Pretends to be LibreOffice, by listening on the UNO port until it's killed
+FAKE_LIBREOFFICE = f"""#!{sys.executable}
+import re, socket, sys, time
+port = int(re.search("port=([0-9]+)", sys.argv[-1]).group(1))
+listener = socket.create_server(("127.0.0.1", port))
+time.sleep(60)
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def sleeper(seconds):
+    return subprocess.Popen(
+        [sys.executable, "-c", f"import time; time.sleep({seconds})"]
+    )
+
+
+@pytest.fixture
+def restore_signals():
+    # start() installs signal handlers, don't leave them behind for pytest
+    handlers = {
+        signum: signal.getsignal(signum)
+        for signum in (signal.SIGINT, signal.SIGTERM, getattr(signal, "SIGHUP", None))
+        if signum is not None
+    }
+    yield
+    for signum, handler in handlers.items():
+        signal.signal(signum, handler)
+
 
 @mock.patch("threading.Thread")
 @mock.patch("subprocess.Popen")
-def test_server_params(popen_mock, thread_mock):
+def test_server_params(popen_mock, thread_mock, restore_signals):
+    # LibreOffice "exits" right away, we only check how it was started
+    popen_mock.return_value.poll.return_value = 1
     srv = server.UnoServer(port="2203", uno_port="2202")
     srv.start()
     popen_mock.assert_called_with(
@@ -24,13 +70,15 @@ def test_server_params(popen_mock, thread_mock):
             "--norestore",
             f"-env:UserInstallation={srv.user_installation}",
             "--accept=socket,host=127.0.0.1,port=2202,tcpNoDelay=1;urp;StarOffice.ComponentContext",
-        ]
+        ],
+        start_new_session=True,
     )
 
 
 @mock.patch("threading.Thread")
 @mock.patch("subprocess.Popen")
-def test_server_ipv6_params(popen_mock, thread_mock):
+def test_server_ipv6_params(popen_mock, thread_mock, restore_signals):
+    popen_mock.return_value.poll.return_value = 1
     srv = server.UnoServer(interface="::", port="2203", uno_port="2202")
     srv.start()
     popen_mock.assert_called_with(
@@ -45,5 +93,338 @@ def test_server_ipv6_params(popen_mock, thread_mock):
             "--norestore",
             f"-env:UserInstallation={srv.user_installation}",
             "--accept=socket,host=127.0.0.1,port=2202,tcpNoDelay=1;urp;StarOffice.ComponentContext",
-        ]
+        ],
+        start_new_session=True,
+    )
+
+
+def test_process_watcher():
+    process = sleeper(0.5)
+    with server._ProcessWatcher(process) as watcher:
+        assert not watcher.wait(timeout=0.01)
+        start = time.monotonic()
+        assert watcher.wait(timeout=10)
+        # It returns when the process exits, not when the timeout runs out
+        assert time.monotonic() - start < 5
+
+    # A process that's already dead
+    with server._ProcessWatcher(process) as watcher:
+        assert watcher.wait(timeout=0)
+
+
+@pytest.fixture
+def high_pidfd():
+    """Makes pidfds land above 1024, like in a process with many open files"""
+    if not hasattr(os, "pidfd_open"):
+        pytest.skip("Needs pidfd_open()")
+    fcntl = pytest.importorskip("fcntl")
+    resource = pytest.importorskip("resource")
+    if resource.getrlimit(resource.RLIMIT_NOFILE)[0] <= 1100:
+        pytest.skip("Not allowed to open that many files")
+
+    pidfd_open = os.pidfd_open
+
+    def high_pidfd_open(pid, *args):
+        fd = pidfd_open(pid, *args)
+        try:
+            return fcntl.fcntl(fd, fcntl.F_DUPFD, 1100)
+        finally:
+            os.close(fd)
+
+    with mock.patch("os.pidfd_open", side_effect=high_pidfd_open):
+        yield
+
+
+def test_process_watcher_high_fd(high_pidfd):
+    process = sleeper(0.5)
+    with server._ProcessWatcher(process) as watcher:
+        assert watcher._pidfd >= 1024
+        assert not watcher.wait(timeout=0.01)
+        assert watcher.wait(timeout=10)
+
+
+def test_process_watcher_blocking_high_fd(high_pidfd):
+    # main() parks on wait() without a timeout until LibreOffice exits
+    process = sleeper(0.2)
+    with server._ProcessWatcher(process) as watcher:
+        assert watcher._pidfd >= 1024
+        assert watcher.wait()
+
+
+def test_wait_for_libreoffice_listening():
+    srv = server.UnoServer(port="2203", uno_port=str(free_port()))
+    srv.libreoffice_process = sleeper(10)
+    try:
+        with socket.create_server(("127.0.0.1", srv.uno_port)):
+            assert srv._wait_for_libreoffice(timeout=10)
+    finally:
+        srv.libreoffice_process.kill()
+        srv.libreoffice_process.wait()
+
+
+def test_wait_for_libreoffice_exits():
+    srv = server.UnoServer(port="2203", uno_port=str(free_port()))
+    srv.libreoffice_process = sleeper(0.2)
+    start = time.monotonic()
+    assert not srv._wait_for_libreoffice(timeout=10)
+    assert time.monotonic() - start < 5
+
+
+def test_start_libreoffice_exits(restore_signals):
+    srv = server.UnoServer(port=str(free_port()), uno_port=str(free_port()))
+    # Python exits with an error on LibreOffice's command line arguments
+    assert srv.start(executable=sys.executable) is None
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Needs a shebang script")
+def test_start(tmp_path, restore_signals):
+    executable = tmp_path / "libreoffice"
+    executable.write_text(FAKE_LIBREOFFICE)
+    executable.chmod(0o755)
+
+    srv = server.UnoServer(port=str(free_port()), uno_port=str(free_port()))
+    with mock.patch.object(srv, "_serve") as serve_mock:
+        process = srv.start(executable=str(executable))
+        assert process is not None
+        assert process.poll() is None
+        serve_mock.assert_called_once()
+
+        srv.stop()
+        assert process.poll() is not None
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Needs a shebang script")
+def test_start_serve_fails(tmp_path, restore_signals):
+    executable = tmp_path / "libreoffice"
+    executable.write_text(FAKE_LIBREOFFICE)
+    executable.chmod(0o755)
+
+    srv = server.UnoServer(port=str(free_port()), uno_port=str(free_port()))
+
+    def serve():
+        # Like when it can't connect to LibreOffice
+        srv._ready_error = RuntimeError("Could not start Libreoffice")
+
+    with mock.patch.object(srv, "_serve", side_effect=serve):
+        assert srv.start(executable=str(executable)) is None
+        assert srv.libreoffice_process is None
+
+
+@pytest.fixture
+def timeout_server():
+    srv = server.UnoServer(conversion_timeout=0.2)
+    srv.cancel_timeout = 0.2
+    srv.conv = mock.Mock()
+    srv._conv_executor = futures.ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    with mock.patch.object(srv, "_safe_terminate_process"):
+        yield srv, release
+    # Unblock the worker thread
+    release.set()
+    srv._conv_executor.shutdown()
+
+
+def test_run_with_timeout(timeout_server):
+    srv, release = timeout_server
+    cancel = mock.Mock()
+    result = srv._run_with_timeout(
+        srv._conv_executor, "Conversion", lambda data, token: data, cancel, b"abc"
+    )
+    assert result == b"abc"
+    cancel.assert_not_called()
+
+
+def test_run_with_timeout_cancel(timeout_server):
+    srv, release = timeout_server
+    tokens = []
+
+    def convert(token):
+        tokens.append(token)
+        release.wait()
+        raise RuntimeError("Document was closed")
+
+    cancel = mock.Mock(side_effect=lambda token: release.set())
+    with pytest.raises(futures.TimeoutError):
+        srv._run_with_timeout(srv._conv_executor, "Conversion", convert, cancel)
+
+    # Only the conversion that timed out is cancelled
+    cancel.assert_called_once_with(tokens[0])
+    srv._safe_terminate_process.assert_not_called()
+
+
+def test_run_with_timeout_cancel_fails(timeout_server):
+    srv, release = timeout_server
+    cancel = mock.Mock()
+    with pytest.raises(futures.TimeoutError):
+        srv._run_with_timeout(
+            srv._conv_executor, "Conversion", lambda token: release.wait(), cancel
+        )
+
+    # Still running after cancelling, so LibreOffice is terminated
+    cancel.assert_called_once()
+    srv.conv.local_context.dispose.assert_called_once()
+    srv._safe_terminate_process.assert_called_once()
+
+
+def test_run_with_timeout_never_started(timeout_server):
+    srv, release = timeout_server
+    # An earlier conversion is still running
+    srv._conv_executor.submit(release.wait)
+
+    cancel = mock.Mock()
+    with pytest.raises(futures.TimeoutError):
+        srv._run_with_timeout(
+            srv._conv_executor, "Conversion", lambda token: b"abc", cancel
+        )
+
+    cancel.assert_not_called()
+    srv._safe_terminate_process.assert_not_called()
+
+
+def test_run_with_timeout_terminate(timeout_server):
+    srv, release = timeout_server
+    srv.terminate_on_timeout = True
+    cancel = mock.Mock()
+    with pytest.raises(futures.TimeoutError):
+        srv._run_with_timeout(
+            srv._conv_executor, "Conversion", lambda token: release.wait(), cancel
+        )
+
+    cancel.assert_not_called()
+    srv._safe_terminate_process.assert_called_once()
+
+
+def test_run_with_timeout_finishes_late(timeout_server):
+    srv, release = timeout_server
+    wait = futures.wait
+
+    def late_wait(fs, timeout):
+        # It finishes just after the wait timed out
+        wait(fs)
+        return set(), set(fs)
+
+    cancel = mock.Mock()
+    with mock.patch("concurrent.futures.wait", side_effect=late_wait):
+        result = srv._run_with_timeout(
+            srv._conv_executor, "Conversion", lambda token: b"abc", cancel
+        )
+
+    assert result == b"abc"
+    cancel.assert_not_called()
+
+
+def test_xmlrpc_server_wakeup():
+    wakeup_r, wakeup_w = socket.socketpair()
+    wakeup_r.setblocking(False)
+    with wakeup_r, wakeup_w, server.XMLRPCServer(
+        ("127.0.0.1", 0), wakeup=wakeup_r
+    ) as srv:
+        stopped = threading.Event()
+
+        def serve():
+            try:
+                srv.serve_forever()
+            except server._SignalReceived:
+                stopped.set()
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        assert not stopped.wait(timeout=0.1)
+
+        # Like a signal arriving
+        wakeup_w.send(bytes([signal.SIGTERM]))
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert stopped.is_set()
+
+        # serve_forever() is finished, so this doesn't wait for it
+        shutdown = threading.Thread(target=srv.shutdown)
+        shutdown.start()
+        shutdown.join(timeout=5)
+        assert not shutdown.is_alive()
+
+
+class FakeUnoException(Exception):
+    pass
+
+
+@pytest.fixture
+def connect_server():
+    # The UNO libraries aren't needed to test the retries
+    uno = types.ModuleType("com.sun.star.uno")
+    uno.Exception = FakeUnoException
+    modules = {
+        "com": types.ModuleType("com"),
+        "com.sun": types.ModuleType("com.sun"),
+        "com.sun.star": types.ModuleType("com.sun.star"),
+        "com.sun.star.uno": uno,
+    }
+    srv = server.UnoServer()
+    with mock.patch.dict("sys.modules", modules), mock.patch.object(
+        srv, "_safe_terminate_process"
+    ), mock.patch.object(srv._abort_startup, "wait") as wait_mock, mock.patch(
+        "random.uniform", return_value=0
+    ):
+        yield srv, wait_mock
+
+
+def test_connect_with_retry(connect_server):
+    srv, wait_mock = connect_server
+    connection = object()
+    cls = mock.Mock(
+        side_effect=[FakeUnoException("Connection refused")] * 4 + [connection]
     )
+
+    assert srv._connect_with_retry(cls, "UnoConverter", cap=0.3) is connection
+    assert cls.call_count == 5
+    # Exponential backoff, up to the cap
+    delays = [call.args[0] for call in wait_mock.call_args_list]
+    assert delays == pytest.approx([0.1, 0.2, 0.3, 0.3])
+    srv._safe_terminate_process.assert_not_called()
+
+
+def test_connect_with_retry_gives_up(connect_server):
+    srv, wait_mock = connect_server
+    cls = mock.Mock(side_effect=FakeUnoException("Connection refused"))
+
+    with pytest.raises(RuntimeError):
+        srv._connect_with_retry(cls, "UnoConverter", max_attempts=3)
+    assert cls.call_count == 3
+    srv._safe_terminate_process.assert_called_once()
+
+
+def test_connect_with_retry_other_error(connect_server):
+    srv, wait_mock = connect_server
+    cls = mock.Mock(side_effect=FakeUnoException("Binary URP bridge disposed"))
+
+    with pytest.raises(RuntimeError):
+        srv._connect_with_retry(cls, "UnoConverter")
+    # Only a refused connection is retried
+    cls.assert_called_once()
+    wait_mock.assert_not_called()
+    srv._safe_terminate_process.assert_called_once()
+
+
+def test_connect_with_retry_aborted(connect_server):
+    srv, wait_mock = connect_server
+    srv._abort_startup.set()
+    cls = mock.Mock()
+
+    with pytest.raises(RuntimeError):
+        srv._connect_with_retry(cls, "UnoConverter")
+    cls.assert_not_called()
+    srv._safe_terminate_process.assert_called_once()
+
+
+@pytest.mark.parametrize("intentional_exit, status", [(True, 0), (False, 2)])
+def test_main_start_fails(intentional_exit, status):
+    def start(self, executable):
+        # A signal during startup sets intentional_exit
+        self.intentional_exit = intentional_exit
+        return None
+
+    argv = ["unoserver", "--executable", "libreoffice"]
+    with mock.patch("sys.argv", argv), mock.patch.object(
+        server.UnoServer, "start", start
+    ):
+        assert server.main() == status